@@ -7,36 +7,340 @@ GraphQL API 客户端
 """
 
 import requests
-import json
+import orjson
 import argparse
+import asyncio
+import base64
+import functools
+import hashlib
+import logging
+import re
+import socket
 import sys
-from urllib.parse import urljoin
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urljoin
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    from graphql import GraphQLError, parse, print_ast, visit, Visitor
+    from graphql.language import (
+        DocumentNode, FieldNode, FragmentDefinitionNode, FragmentSpreadNode, NameNode,
+        OperationDefinitionNode, OperationType, SelectionSetNode, VariableNode
+    )
+    GRAPHQL_CORE_AVAILABLE = True
+except ImportError:
+    GRAPHQL_CORE_AVAILABLE = False
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:
+    ijson = None
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 请求与响应解析可能抛出的异常，orjson.JSONDecodeError 是 ValueError 的子类
+REQUEST_ERRORS = (requests.RequestException, ValueError)
+if httpx is not None:
+    REQUEST_ERRORS += (httpx.HTTPError,)
+
+# 服务端返回 JSON 响应体时使用的 Content-Type
+JSON_CONTENT_TYPES = ('application/json', 'application/graphql-response+json')
+
+# 连接建立时设置的 socket 选项: 关闭 Nagle 算法 (urllib3 默认已包含 TCP_NODELAY)，
+# 并开启 TCP keep-alive 探测，避免空闲的池化连接被中间设备静默断开
+SOCKET_OPTIONS = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+
+# httpx 连接的请求超时 (秒)
+REQUEST_TIMEOUT = 30.0
+
+# 令牌在过期前多少秒即主动刷新
+TOKEN_REFRESH_MARGIN = 60
+
+# 优先协商压缩率更高的 zstd/br，仅声明 urllib3 可透明解压的编码
+# (br 需要 brotli，zstd 需要 zstandard)
+ACCEPT_ENCODING_PREFERRED = ", ".join(
+    encoding for encoding in ("zstd", "br", "gzip", "deflate")
+    if encoding in ACCEPT_ENCODING.split(",")
+)
+
+# 含 mutation 的操作不能改用 GET 发送
+MUTATION_PATTERN = re.compile(r'\bmutation\b')
+
+# 条件 GET 缓存的最大条目数
+ETAG_CACHE_SIZE = 128
+
+# 条件 GET 的 URL 长度上限，超过时直接用 POST 发送，避免服务端返回 414
+MAX_GET_URL_LENGTH = 8192
+
+# 命令行未指定查询时使用的默认查询 (与实际 schema 匹配)，请求体在模块加载时即编码完成
+DEFAULT_QUERY = "{ me { userId email role } }"
+DEFAULT_BODY = orjson.dumps({"query": DEFAULT_QUERY})
+
+# GraphQLClient.default() 缓存的客户端，按 (base_url, email) 区分，
+# 每项包含客户端和该项自己的锁
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=256)
+def _encode_query(query):
+    """缓存查询字符串编码后的请求体前缀 (去掉结尾的 '}')"""
+    return orjson.dumps({"query": query})[:-1]
+
+
+@functools.lru_cache(maxsize=256)
+def _query_hash(query):
+    """缓存查询字符串的 SHA-256 摘要，用于自动持久化查询 (APQ)"""
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+def _encode_persisted_query(query_hash):
+    """编码 APQ 的 extensions 字段"""
+    return b'"extensions":{"persistedQuery":{"version":1,"sha256Hash":"' + query_hash.encode() + b'"}}'
+
+
+def _encode_payload(query, variables=None, query_hash=None):
+    """将查询与变量编码为 JSON 请求体，查询部分复用缓存的编码结果
+
+    Args:
+        query (str): GraphQL 查询字符串
+        variables (dict, optional): 查询变量
+        query_hash (str, optional): 附带的 APQ 摘要，服务端据此缓存查询
+
+    Returns:
+        bytes: JSON 请求体
+    """
+    body = _encode_query(query)
+    if query_hash:
+        body += b',' + _encode_persisted_query(query_hash)
+    if variables:
+        body += b',"variables":' + orjson.dumps(variables)
+    return body + b'}'
+
+
+def _encode_hash_payload(query_hash, variables=None):
+    """编码只包含 APQ 摘要、不含查询字符串的请求体"""
+    body = b'{' + _encode_persisted_query(query_hash)
+    if variables:
+        body += b',"variables":' + orjson.dumps(variables)
+    return body + b'}'
+
+
+class SocketOptionsAdapter(HTTPAdapter):
+    """为连接池中的每个新连接设置 SOCKET_OPTIONS 的 HTTPAdapter"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault('socket_options', SOCKET_OPTIONS)
+        super().init_poolmanager(*args, **kwargs)
+
+
+if GRAPHQL_CORE_AVAILABLE:
+    class _BatchPrefixer(Visitor):
+        """为查询中的变量和片段名加上前缀，避免合并查询时重名"""
+
+        def __init__(self, prefix):
+            super().__init__()
+            self.prefix = prefix
+
+        def enter_variable(self, node, *_):
+            return VariableNode(name=NameNode(value=self.prefix + node.name.value))
+
+        def enter_fragment_spread(self, node, *_):
+            return FragmentSpreadNode(
+                name=NameNode(value=self.prefix + node.name.value),
+                directives=node.directives
+            )
+
+        def enter_fragment_definition(self, node, *_):
+            return FragmentDefinitionNode(
+                name=NameNode(value=self.prefix + node.name.value),
+                type_condition=node.type_condition,
+                variable_definitions=node.variable_definitions,
+                directives=node.directives,
+                selection_set=node.selection_set
+            )
+
 
 class GraphQLClient:
-    def __init__(self, base_url, verbose=False):
+    def __init__(self, base_url, verbose=False, http2=False, auth_endpoint="/auth/token", graphql_endpoint="/graphql",
+                 persisted_queries=False, conditional_get=False):
         """初始化 GraphQL 客户端
 
         Args:
             base_url (str): API 基础 URL，例如 http://localhost:3000
-            verbose (bool): 是否显示详细日志
+            verbose (bool): 是否显示详细日志 (以 DEBUG 级别写入 logging，调用方未配置 logging 时输出到标准输出)
+            http2 (bool): 是否使用 httpx 的 HTTP/2 连接，多个并发查询复用同一个 TLS 连接
+            auth_endpoint (str): 默认的登录接口路径
+            graphql_endpoint (str): 默认的 GraphQL 接口路径
+            persisted_queries (bool): 是否启用自动持久化查询 (APQ)，已注册的查询只发送摘要
+            conditional_get (bool): 是否以带 If-None-Match 的 GET 发送只读查询，响应未变化时复用缓存结果
         """
         self.base_url = base_url
         self.token = None
+        self.auth_endpoint = auth_endpoint
+        self.graphql_endpoint = graphql_endpoint
         self.verbose = verbose
-        self.session = requests.Session()
+        
+        # 详细日志走 logging 的 DEBUG 级别，verbose 实例使用自己的子 logger 开启 DEBUG，
+        # 不影响其他实例；子 logger 不注册到全局表，随实例一起释放
+        self._log = logging.getLogger(__name__)
+        if verbose:
+            log = logging.Logger(f"{__name__}.client", logging.DEBUG)
+            log.parent = self._log
+            if not self._log.hasHandlers():
+                # 调用方未配置 logging 时直接输出到标准输出
+                handler = logging.StreamHandler(sys.stdout)
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                log.addHandler(handler)
+            self._log = log
+        
+        if http2 and (httpx is None or not HTTP2_AVAILABLE):
+            print("⚠️ HTTP/2 需要安装 httpx[http2]，已回退到 HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        
+        if http2:
+            # 单个连接上多路复用请求，避免 HTTP/1.1 的队头阻塞
+            self.session = httpx.Client(
+                headers={'Content-Type': 'application/json'},
+                transport=httpx.HTTPTransport(
+                    http2=True,
+                    retries=3,
+                    limits=httpx.Limits(max_keepalive_connections=32),
+                    socket_options=SOCKET_OPTIONS
+                ),
+                timeout=REQUEST_TIMEOUT
+            )
+        else:
+            self.session = requests.Session()
+
+            # 复用连接池并对网关类错误做有限重试，避免每次查询重新建立 TCP/TLS 连接
+            adapter = SocketOptionsAdapter(
+                pool_connections=32,
+                pool_maxsize=64,
+                max_retries=Retry(
+                    total=3,
+                    backoff_factor=0.2,
+                    status_forcelist=[502, 503, 504],
+                    allowed_methods=["GET", "POST"],
+                    raise_on_status=False
+                )
+            )
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+            self.session.headers.update({
+                'Connection': 'keep-alive',
+                'Content-Type': 'application/json',
+                'Accept-Encoding': ACCEPT_ENCODING_PREFERRED
+            })
+
+        # 服务端已缓存的查询摘要
+        self.persisted_queries = persisted_queries
+        self._apq_known = set()
+
+        # 只读查询的 ETag 缓存: 摘要 -> (etag, 响应体)
+        self.conditional_get = conditional_get
+        self._etag_cache = OrderedDict()
+        self._etag_lock = threading.Lock()
+
+        # 并发调用共享同一个进行中的刷新任务，避免重复登录
+        self._credentials = None
+        self._token_exp = None
+        self._refresh_lock = threading.Lock()
+        self._refresh_future = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+    
+    @classmethod
+    def default(cls, base_url, email, password, **kwargs):
+        """获取进程内共享的已登录客户端，同一进程内的重复调用复用会话与令牌
+
+        Args:
+            base_url (str): API 基础 URL
+            email (str): 用户邮箱
+            password (str): 密码
+            **kwargs: 首次创建客户端时传给构造函数的其他参数
+
+        缓存命中时若密码与客户端登录时使用的不同，会用新密码重新登录，失败则返回 None；
+        kwargs 只在首次创建时生效，与已有客户端的设置不同时会给出警告。
+
+        Returns:
+            GraphQLClient: 已登录的客户端，登录失败时返回 None
+        """
+        key = (base_url, email)
+        
+        # 全局锁只保护缓存字典，登录在每个 key 自己的锁内进行，不阻塞其他 key
+        with _CLIENTS_LOCK:
+            entry = _CLIENTS.setdefault(key, {"lock": threading.Lock(), "client": None})
+        
+        with entry["lock"]:
+            client = entry["client"]
+            if client is None:
+                client = cls(base_url, **kwargs)
+                if not client.login(email, password):
+                    return None
+                entry["client"] = client
+                return client
+            
+            ignored = sorted(name for name, value in kwargs.items() if getattr(client, name, None) != value)
+            if ignored:
+                print(f"⚠️ 已存在 {email} 的共享客户端，新的参数 {ignored} 不会生效")
+            
+            # 客户端为刷新令牌本就保存了登录凭据，直接与其比较
+            if password != client._credentials[1]:
+                if not client.login(email, password):
+                    return None
+        
+        return client
+    
+    @property
+    def auth_endpoint(self):
+        """默认的登录接口路径"""
+        return self._auth_endpoint
+    
+    @auth_endpoint.setter
+    def auth_endpoint(self, endpoint):
+        # 完整 URL 只在设置时拼接一次，请求时直接复用
+        self._auth_endpoint = endpoint
+        self._auth_url = urljoin(self.base_url, endpoint)
     
-    def login(self, email, password, endpoint="/auth/token"):
+    @property
+    def graphql_endpoint(self):
+        """默认的 GraphQL 接口路径"""
+        return self._graphql_endpoint
+    
+    @graphql_endpoint.setter
+    def graphql_endpoint(self, endpoint):
+        self._graphql_endpoint = endpoint
+        self._graphql_url = urljoin(self.base_url, endpoint)
+    
+    def login(self, email, password, endpoint=None):
         """获取 JWT 令牌
 
         Args:
             email (str): 用户邮箱
             password (str): 密码
-            endpoint (str): 登录接口路径
+            endpoint (str, optional): 登录接口路径，默认使用 auth_endpoint
 
         Returns:
             bool: 登录是否成功
         """
-        login_url = urljoin(self.base_url, endpoint)
+        login_url = self._auth_url if endpoint is None else urljoin(self.base_url, endpoint)
         
         # 准备登录数据
         login_data = {
@@ -44,117 +348,658 @@ class GraphQLClient:
             "password": password
         }
         
-        if self.verbose:
-            print(f"🔑 正在尝试登录: {login_url}")
-            print(f"邮箱: {email}")
+        self._debug("🔑 正在尝试登录: %s", login_url)
+        self._debug("邮箱: %s", email)
         
         try:
             # 发送登录请求
-            headers = {'Content-Type': 'application/json'}
-            response = self.session.post(login_url, json=login_data, headers=headers)
+            response = self._post(login_url, orjson.dumps(login_data))
             
             # 解析响应
             if response.status_code == 200:
-                result = response.json()
+                result = orjson.loads(response.content)
                 if result.get('success', False) and result.get('token'):
                     self.token = result['token']
-                    if self.verbose:
-                        print(f"✅ 登录成功，已获取令牌")
-                        print(f"令牌类型: {result.get('tokenType', 'Bearer')}")
+                    self._token_exp = self._decode_token_exp(self.token)
+                    self.session.headers['Authorization'] = f"Bearer {self.token}"
+                    self._credentials = (email, password, endpoint)
+                    if self._debug_enabled():
+                        self._log.debug("✅ 登录成功，已获取令牌")
+                        self._log.debug("令牌类型: %s", result.get('tokenType', 'Bearer'))
                         if result.get('user'):
-                            print(f"用户信息: {result['user']['email']} (角色: {result['user']['role']})")
-                        print(f"过期时间: {result.get('expiresIn', '未知')}")
+                            self._log.debug("用户信息: %s (角色: %s)", result['user']['email'], result['user']['role'])
+                        self._log.debug("过期时间: %s", result.get('expiresIn', '未知'))
                     return True
                 else:
                     print(f"❌ 登录失败: {result.get('error', '未知错误')}")
                     return False
             else:
                 print(f"❌ 登录失败: HTTP状态码 {response.status_code}")
-                try:
-                    error_data = response.json()
+                error_data = self._error_body(response)
+                if error_data is not None:
                     print(f"错误信息: {error_data.get('error', '未知错误')}")
-                except:
-                    print(f"错误响应: {response.text[:200]}")
+                else:
+                    print(f"错误响应: {self._preview(response)}")
                 return False
                 
-        except Exception as e:
+        except REQUEST_ERRORS as e:
             print(f"❌ 登录请求异常: {str(e)}")
             return False
     
-    def execute_query(self, query, variables=None, endpoint="/graphql"):
+    def execute_raw(self, body, endpoint=None):
+        """发送已编码好的 GraphQL 请求体
+
+        Args:
+            body (bytes): JSON 请求体，例如 DEFAULT_BODY
+            endpoint (str, optional): GraphQL 接口路径，默认使用 graphql_endpoint
+
+        Returns:
+            dict: 查询结果
+        """
+        if self._debug_enabled():
+            self._log.debug("请求体: %s...", body[:100].decode('utf-8', errors='replace'))
+        
+        return self._execute(endpoint, lambda graphql_url: self._handle_response(self._post(graphql_url, body)))
+    
+    def execute_query(self, query, variables=None, endpoint=None):
         """执行 GraphQL 查询
 
         Args:
             query (str): GraphQL 查询字符串
             variables (dict, optional): 查询变量
-            endpoint (str): GraphQL 接口路径
+            endpoint (str, optional): GraphQL 接口路径，默认使用 graphql_endpoint
 
         Returns:
             dict: 查询结果
         """
-        if not self.token:
-            print("❌ 尚未登录或获取令牌，请先调用 login() 方法")
+        if self._debug_enabled():
+            self._log.debug("查询: %s...", query[:100])
+            if variables:
+                self._log.debug("变量: %s", orjson.dumps(variables).decode())
+        
+        def send(graphql_url):
+            if self.conditional_get and not MUTATION_PATTERN.search(query):
+                return self._execute_conditional(graphql_url, query, variables)
+            return self._handle_response(*self._post_query(graphql_url, query, variables))
+        
+        return self._execute(endpoint, send)
+    
+    def _execute(self, endpoint, send):
+        """execute_raw 与 execute_query 的公共流程: 确保令牌有效、解析接口地址，并统一处理请求异常
+
+        Args:
+            endpoint (str, optional): GraphQL 接口路径，默认使用 graphql_endpoint
+            send (callable): 接收完整接口地址并返回查询结果的函数
+
+        Returns:
+            dict: 查询结果
+        """
+        if not self._ensure_token():
+            return None
+        
+        graphql_url = self._graphql_endpoint_url(endpoint)
+        
+        if self._debug_enabled():
+            self._log.debug("🔍 正在执行查询: %s", graphql_url)
+            self._log.debug("请求头: Authorization: Bearer %s...", self.token[:10])
+        
+        try:
+            return send(graphql_url)
+        except REQUEST_ERRORS as e:
+            print(f"❌ 查询请求异常: {str(e)}")
+            return None
+    
+    def stream_items(self, query, item_path="data.products.items.item", variables=None, endpoint=None):
+        """流式执行 GraphQL 查询，边接收边解析并逐个返回列表元素
+
+        适用于产品列表等大响应，无需将完整响应体读入内存。需要安装 ijson。
+
+        Args:
+            query (str): GraphQL 查询字符串
+            item_path (str): ijson 前缀形式的元素路径，例如 data.products.items.item
+            variables (dict, optional): 查询变量
+            endpoint (str, optional): GraphQL 接口路径，默认使用 graphql_endpoint
+
+        Yields:
+            dict: 路径下的每个元素
+        """
+        if not self._ensure_token():
+            return
+        
+        if ijson is None:
+            print("❌ 流式查询需要安装 ijson: pip install ijson")
+            return
+        
+        graphql_url = self._graphql_endpoint_url(endpoint)
+        
+        self._debug("🔍 正在流式执行查询: %s", graphql_url)
+        self._debug("元素路径: %s", item_path)
+        
+        body = _encode_payload(query, variables)
+        
+        try:
+            if self.http2:
+                stream = self.session.stream("POST", graphql_url, content=body)
+            else:
+                stream = self.session.post(graphql_url, data=body, stream=True)
+            
+            with stream as response:
+                if response.status_code != 200:
+                    if self.http2:
+                        response.read()
+                    self._handle_response(response)
+                    return
+                
+                chunks = response.iter_bytes() if self.http2 else response.iter_content(65536)
+                events = ijson.sendable_list()
+                parser = ijson.parse_coro(events, use_float=True)
+                builder = None
+                
+                for chunk in chunks:
+                    parser.send(chunk)
+                    for prefix, event, value in events:
+                        if builder is not None:
+                            # 仅为单个元素构建对象，构建完成后立即交给调用方
+                            builder.event(event, value)
+                            if prefix == item_path and event in ('end_map', 'end_array'):
+                                yield builder.value
+                                builder = None
+                        elif prefix == 'errors.item.message' and event == 'string':
+                            print(f"⚠️ 查询返回错误: {value}")
+                        elif prefix == item_path:
+                            if event in ('start_map', 'start_array'):
+                                builder = ObjectBuilder()
+                                builder.event(event, value)
+                            else:
+                                yield value
+                    del events[:]
+                parser.close()
+        
+        except REQUEST_ERRORS + (ijson.JSONError,) as e:
+            print(f"❌ 查询请求异常: {str(e)}")
+    
+    def execute_many(self, items, endpoint=None, max_workers=10):
+        """并发执行多个相互独立的 GraphQL 查询
+
+        每次调用都会新建并关闭一个 httpx 连接池 (asyncio.run 结束后事件循环即关闭，
+        连接无法跨调用复用)。已在事件循环中的调用方请直接使用 aexecute_many。
+
+        Args:
+            items (list): (query, variables) 元组列表，variables 可为 None
+            endpoint (str, optional): GraphQL 接口路径，默认使用 graphql_endpoint
+            max_workers (int): 最大并发请求数
+
+        Returns:
+            list: 与 items 顺序一致的查询结果，失败的查询对应 None
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.aexecute_many(items, endpoint, max_workers))
+        
+        print("❌ 不能在运行中的事件循环里调用 execute_many，请改用 await aexecute_many(...)")
+        return None
+    
+    async def aexecute_many(self, items, endpoint=None, max_workers=10, client=None):
+        """execute_many 的异步版本，在同一个 keep-alive 连接池上并发发送查询
+
+        Args:
+            items (list): (query, variables) 元组列表，variables 可为 None
+            endpoint (str, optional): GraphQL 接口路径，默认使用 graphql_endpoint
+            max_workers (int): 最大并发请求数
+            client (httpx.AsyncClient, optional): 调用方持有的客户端，传入后可跨调用复用连接；
+                未传入时本次调用新建连接池并在结束后关闭
+
+        Returns:
+            list: 与 items 顺序一致的查询结果，失败的查询对应 None
+        """
+        # 令牌刷新会同步等待登录请求，放到线程中执行以免阻塞事件循环
+        if not await asyncio.to_thread(self._ensure_token):
             return None
         
-        graphql_url = urljoin(self.base_url, endpoint)
+        if httpx is None:
+            print("❌ 并发查询需要安装 httpx: pip install httpx[http2]")
+            return None
         
-        # 准备请求头
+        graphql_url = self._graphql_endpoint_url(endpoint)
         headers = {
             'Content-Type': 'application/json',
-            'Authorization': f'Bearer {self.token}'
+            'Authorization': self.session.headers['Authorization']
         }
+        semaphore = asyncio.Semaphore(max_workers)
         
-        # 准备查询数据
-        payload = {
-            "query": query
-        }
+        self._debug("🔍 正在并发执行 %d 个查询: %s", len(items), graphql_url)
         
-        if variables:
-            payload["variables"] = variables
+        async def run(client, query, variables):
+            async with semaphore:
+                try:
+                    response = await client.post(
+                        graphql_url, content=_encode_payload(query, variables), headers=headers
+                    )
+                    return self._handle_response(response)
+                except REQUEST_ERRORS as e:
+                    print(f"❌ 查询请求异常: {str(e)}")
+                    return None
         
-        if self.verbose:
-            print(f"🔍 正在执行查询: {graphql_url}")
-            print(f"请求头: Authorization: Bearer {self.token[:10]}...")
-            print(f"查询: {query[:100]}...")
-            if variables:
-                print(f"变量: {json.dumps(variables, ensure_ascii=False)}")
+        if client is not None:
+            return await asyncio.gather(*[run(client, query, variables) for query, variables in items])
+        
+        transport = httpx.AsyncHTTPTransport(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_keepalive_connections=max_workers),
+            socket_options=SOCKET_OPTIONS
+        )
+        async with httpx.AsyncClient(transport=transport, timeout=REQUEST_TIMEOUT) as client:
+            return await asyncio.gather(*[run(client, query, variables) for query, variables in items])
+    
+    def execute_batch(self, items, endpoint=None, merge=False):
+        """在一次 HTTP 请求中批量执行多个 GraphQL 查询
+
+        默认将查询以 JSON 数组形式发送，需要服务端开启批量请求支持
+        (Apollo Server 的 allowBatchedHttpRequests)。merge=True 时会把所有查询
+        合并为一个带别名的操作，适用于任意 GraphQL 服务端，但需要安装 graphql-core。
+
+        Args:
+            items (list): (query, variables) 元组列表，variables 可为 None
+            endpoint (str, optional): GraphQL 接口路径，默认使用 graphql_endpoint
+            merge (bool): 是否合并为单个带别名的查询
+
+        Returns:
+            list: 与 items 顺序一致的查询结果，请求失败时返回 None
+        """
+        if not self._ensure_token():
+            return None
+        
+        graphql_url = self._graphql_endpoint_url(endpoint)
+        
+        if merge:
+            return self._execute_merged(items, graphql_url)
+        
+        body = b'[' + b','.join(_encode_payload(query, variables) for query, variables in items) + b']'
+        
+        self._debug("🔍 正在批量执行 %d 个查询: %s", len(items), graphql_url)
         
         try:
-            response = self.session.post(graphql_url, headers=headers, json=payload)
+            response = self._post(graphql_url, body)
+            if response.status_code != 200:
+                return self._handle_response(response)
             
-            if response.status_code == 200:
-                result = response.json()
+            results = orjson.loads(response.content)
+            if not isinstance(results, list):
+                print("❌ 服务端不支持批量请求，请使用 merge=True")
+                return None
+            
+            if not all(isinstance(result, dict) for result in results):
+                print("❌ 批量查询失败: 响应中包含非 JSON 对象的结果")
+                print(f"响应内容: {self._preview(response)}")
+                return None
+            
+            for result in results:
                 if result.get('errors'):
                     print(f"⚠️ 查询返回错误:")
                     for error in result['errors']:
                         print(f"  - {error.get('message')}")
-                return result
-            elif response.status_code == 401:
-                print(f"❌ 认证失败: 令牌无效或已过期")
-                try:
-                    error_data = response.json()
-                    if error_data.get('errors'):
-                        for error in error_data['errors']:
-                            print(f"  - {error.get('message')}")
-                except:
-                    print(f"响应内容: {response.text[:200]}")
-                return None
-            else:
-                print(f"❌ 查询失败: HTTP {response.status_code}")
-                try:
-                    error_data = response.json()
-                    if error_data.get('errors'):
-                        for error in error_data['errors']:
-                            print(f"  - {error.get('message')}")
-                except:
-                    print(f"响应内容: {response.text[:200]}")
+            return results
+        
+        except REQUEST_ERRORS as e:
+            print(f"❌ 批量查询请求异常: {str(e)}")
+            return None
+    
+    def _execute_merged(self, items, graphql_url):
+        """将多个查询合并为一个带别名的操作执行，并按原查询拆分结果"""
+        if not GRAPHQL_CORE_AVAILABLE:
+            print("❌ 合并查询需要安装 graphql-core: pip install graphql-core")
+            return None
+        
+        try:
+            query, variables, aliases = self._merge_queries(items)
+        except (GraphQLError, ValueError) as e:
+            print(f"❌ 无法合并查询: {str(e)}")
+            return None
+        
+        self._debug("🔍 正在合并执行 %d 个查询: %s", len(items), graphql_url)
+        
+        try:
+            response = self._post(graphql_url, orjson.dumps({"query": query, "variables": variables}))
+            merged = self._handle_response(response)
+        except REQUEST_ERRORS as e:
+            print(f"❌ 批量查询请求异常: {str(e)}")
+            return None
+        
+        if merged is None:
+            return None
+        
+        return self._split_merged(merged, aliases)
+    
+    @staticmethod
+    def _split_merged(merged, aliases):
+        """按别名将合并查询的 data 与 errors 拆回每个原查询，没有 path 的错误归属所有查询"""
+        data = merged.get('data') or {}
+        errors = merged.get('errors') or []
+        results = []
+        for alias_map in aliases:
+            result = {"data": {key: data.get(alias) for alias, key in alias_map.items()}}
+            own_errors = [
+                error for error in errors
+                if not error.get('path') or error['path'][0] in alias_map
+            ]
+            if own_errors:
+                result["errors"] = own_errors
+            results.append(result)
+        return results
+    
+    @staticmethod
+    def _merge_queries(items):
+        """为每个查询的顶层字段、变量和片段加上 batchN_ 前缀后合并为一个查询
+
+        Returns:
+            tuple: (合并后的查询字符串, 合并后的变量, 每个查询的 {别名: 原字段名} 映射)
+        """
+        selections = []
+        variable_definitions = []
+        fragments = []
+        merged_variables = {}
+        aliases = []
+        
+        for i, (query, variables) in enumerate(items):
+            prefix = f"batch{i}_"
+            document = visit(parse(query), _BatchPrefixer(prefix))
+            operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+            if len(operations) != 1 or operations[0].operation != OperationType.QUERY:
+                raise ValueError(f"第 {i + 1} 个查询必须且只能包含一个 query 操作")
+            operation = operations[0]
+            
+            alias_map = {}
+            for selection in operation.selection_set.selections:
+                if not isinstance(selection, FieldNode):
+                    raise ValueError(f"第 {i + 1} 个查询的顶层只能包含字段")
+                key = (selection.alias or selection.name).value
+                alias = prefix + key
+                alias_map[alias] = key
+                selections.append(FieldNode(
+                    alias=NameNode(value=alias),
+                    name=selection.name,
+                    arguments=selection.arguments,
+                    directives=selection.directives,
+                    selection_set=selection.selection_set
+                ))
+            aliases.append(alias_map)
+            
+            variable_definitions.extend(operation.variable_definitions or [])
+            fragments.extend(d for d in document.definitions if isinstance(d, FragmentDefinitionNode))
+            for name, value in (variables or {}).items():
+                merged_variables[prefix + name] = value
+        
+        merged_operation = OperationDefinitionNode(
+            operation=OperationType.QUERY,
+            name=NameNode(value="BatchedQuery"),
+            variable_definitions=tuple(variable_definitions),
+            directives=(),
+            selection_set=SelectionSetNode(selections=tuple(selections))
+        )
+        merged_document = DocumentNode(definitions=(merged_operation, *fragments))
+        return print_ast(merged_document), merged_variables, aliases
+    
+    def _graphql_endpoint_url(self, endpoint):
+        """返回 GraphQL 接口 URL，未指定路径时使用预先拼接好的默认 URL"""
+        if endpoint is None:
+            return self._graphql_url
+        return urljoin(self.base_url, endpoint)
+    
+    def _post(self, url, body):
+        """发送已编码的 JSON 请求体，兼容 requests 与 httpx 两种连接"""
+        if self.http2:
+            return self.session.post(url, content=body)
+        return self.session.post(url, data=body)
+    
+    def _post_query(self, graphql_url, query, variables):
+        """以 POST 发送单个查询，启用 APQ 时走持久化查询协议
+
+        Returns:
+            tuple: (响应对象, 已解析的响应体或 None)，可直接传给 _handle_response
+        """
+        if self.persisted_queries:
+            return self._post_persisted(graphql_url, query, variables)
+        return self._post(graphql_url, _encode_payload(query, variables)), None
+    
+    def _execute_conditional(self, graphql_url, query, variables):
+        """以带 If-None-Match 的 GET 执行只读查询，服务端返回 304 时直接使用缓存结果
+
+        缓存的是原始响应体，每次命中都重新解析，调用方修改返回值不会影响之后的结果。
+        URL 超过 MAX_GET_URL_LENGTH 或服务端返回 414 的查询改用 POST 发送。
+        """
+        params = {"query": query}
+        if variables:
+            params["variables"] = orjson.dumps(variables).decode()
+        
+        query_string = urlencode(params)
+        if len(graphql_url) + len(query_string) >= MAX_GET_URL_LENGTH:
+            return self._handle_response(*self._post_query(graphql_url, query, variables))
+        
+        key = hashlib.sha256(query_string.encode()).hexdigest()
+        with self._etag_lock:
+            cached = self._etag_cache.get(key)
+        
+        headers = {'If-None-Match': cached[0]} if cached else None
+        response = self.session.get(graphql_url, params=query_string, headers=headers)
+        
+        if response.status_code == 304 and cached:
+            self._debug("♻️ 查询结果未变化，使用缓存结果")
+            with self._etag_lock:
+                if key in self._etag_cache:
+                    self._etag_cache.move_to_end(key)
+            return orjson.loads(cached[1])
+        
+        if response.status_code in (400, 405):
+            # 服务端可能只接受 POST (405，或如 Apollo 的 CSRF 防护返回 400)，改用 POST 重发；
+            # 400 也可能是查询本身有误，因此只有 POST 成功时才关闭条件 GET
+            post_response, post_result = self._post_query(graphql_url, query, variables)
+            if response.status_code == 405 or post_response.status_code == 200:
+                self._debug("⚠️ 服务端不支持 GET 查询，已关闭条件 GET")
+                self.conditional_get = False
+            return self._handle_response(post_response, post_result)
+        
+        if response.status_code == 414:
+            # 服务端的 URL 上限比 MAX_GET_URL_LENGTH 更小，只有这个查询改用 POST
+            return self._handle_response(*self._post_query(graphql_url, query, variables))
+        
+        result = self._handle_response(response)
+        etag = response.headers.get('ETag')
+        if result is not None and etag and not result.get('errors'):
+            with self._etag_lock:
+                self._etag_cache[key] = (etag, response.content)
+                self._etag_cache.move_to_end(key)
+                if len(self._etag_cache) > ETAG_CACHE_SIZE:
+                    self._etag_cache.popitem(last=False)
+        return result
+    
+    def _post_persisted(self, graphql_url, query, variables):
+        """按 APQ 协议发送查询：先只发送摘要，服务端返回 PERSISTED_QUERY_NOT_FOUND 时再发送完整查询注册，
+        服务端不支持 APQ 时关闭 APQ 并以普通请求重发
+
+        Returns:
+            tuple: (响应对象, 已解析的响应体或 None)
+        """
+        query_hash = _query_hash(query)
+        
+        response, result = self._post_parsed(graphql_url, _encode_hash_payload(query_hash, variables))
+        code = self._apq_error_code(result)
+        if code == 'PERSISTED_QUERY_NOT_SUPPORTED':
+            return self._disable_persisted_queries(graphql_url, query, variables)
+        
+        if code is None:
+            # 已注册的查询返回普通的 GraphQL 错误时原样交给调用方
+            if query_hash in self._apq_known:
+                return response, result
+            if response.status_code == 200 and isinstance(result, dict) and result.get('data') is not None:
+                self._apq_known.add(query_hash)
+                return response, result
+            # 支持 APQ 的服务端对未注册的摘要必定返回 PERSISTED_QUERY_NOT_FOUND，
+            # 没有错误码的失败说明服务端忽略了 extensions (如只读取 query 字段的处理函数)
+            return self._disable_persisted_queries(graphql_url, query, variables)
+        
+        self._apq_known.discard(query_hash)
+        self._debug("🔁 服务端未缓存查询 %s，发送完整查询", query_hash[:12])
+        
+        response, result = self._post_parsed(graphql_url, _encode_payload(query, variables, query_hash))
+        code = self._apq_error_code(result)
+        if code == 'PERSISTED_QUERY_NOT_SUPPORTED':
+            return self._disable_persisted_queries(graphql_url, query, variables)
+        if response.status_code == 200 and code is None:
+            self._apq_known.add(query_hash)
+        return response, result
+    
+    def _disable_persisted_queries(self, graphql_url, query, variables):
+        """关闭 APQ，并以不带 extensions 的普通请求重发查询"""
+        self._debug("⚠️ 服务端不支持持久化查询，已关闭 APQ")
+        self.persisted_queries = False
+        self._apq_known.clear()
+        return self._post(graphql_url, _encode_payload(query, variables)), None
+    
+    def _post_parsed(self, graphql_url, body):
+        """发送请求并解析 JSON 响应体，非 JSON 或格式错误时解析结果为 None"""
+        response = self._post(graphql_url, body)
+        if not self._is_json(response):
+            return response, None
+        try:
+            return response, orjson.loads(response.content)
+        except ValueError:
+            return response, None
+    
+    @staticmethod
+    def _apq_error_code(result):
+        """从响应的 errors[].extensions.code 中取出 APQ 相关的错误码"""
+        if not isinstance(result, dict):
+            return None
+        for error in result.get('errors') or ():
+            code = (error.get('extensions') or {}).get('code') if isinstance(error, dict) else None
+            if code in ('PERSISTED_QUERY_NOT_FOUND', 'PERSISTED_QUERY_NOT_SUPPORTED'):
+                return code
+        return None
+    
+    def _debug_enabled(self):
+        """当前实例是否需要输出 DEBUG 日志，用于跳过构造开销较大的日志参数"""
+        return self.verbose and self._log.isEnabledFor(logging.DEBUG)
+    
+    def _debug(self, msg, *args):
+        """仅在 verbose 实例上记录 DEBUG 日志，参数延迟格式化"""
+        if self.verbose:
+            self._log.debug(msg, *args)
+    
+    def _ensure_token(self):
+        """检查是否已登录，令牌即将过期时先刷新
+
+        Returns:
+            bool: 是否可以继续发送查询
+        """
+        if not self.token:
+            print("❌ 尚未登录或获取令牌，请先调用 login() 方法")
+            return False
+        
+        if self._token_expiring() and not self._ensure_refreshed():
+            # 刷新失败时，只要旧令牌尚未过期就继续使用
+            return self._token_exp > time.time()
+        return True
+    
+    @staticmethod
+    def _decode_token_exp(token):
+        """从 JWT 的 payload 中解析 exp 声明，无法解析时返回 None"""
+        try:
+            segment = token.split('.')[1]
+            claims = orjson.loads(base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4)))
+            return claims.get('exp')
+        except (IndexError, ValueError, AttributeError):
+            return None
+    
+    def _token_expiring(self):
+        """根据登录时解析的 exp 判断令牌是否即将过期"""
+        if self._token_exp is None or not self._credentials:
+            return False
+        return self._token_exp - time.time() < TOKEN_REFRESH_MARGIN
+    
+    def _ensure_refreshed(self):
+        """刷新即将过期的令牌，并发调用方等待同一个刷新任务
+
+        Returns:
+            bool: 刷新后令牌是否可用
+        """
+        with self._refresh_lock:
+            if self._refresh_future is None:
+                # 等待锁期间其他调用方可能已完成刷新
+                if not self._token_expiring():
+                    return True
+                self._debug("🔄 令牌即将过期，正在重新登录")
+                self._refresh_future = self._executor.submit(self.login, *self._credentials)
+            future = self._refresh_future
+        
+        success = future.result()
+        
+        with self._refresh_lock:
+            if self._refresh_future is future:
+                self._refresh_future = None
+        
+        return success
+    
+    def _handle_response(self, response, result=None):
+        """解析 GraphQL 响应并打印错误信息
+
+        Args:
+            response: requests 或 httpx 的响应对象
+            result (dict, optional): 已解析的响应体，传入时不再重复解析
+
+        Returns:
+            dict: 查询结果，请求失败时返回 None
+        """
+        if response.status_code == 200:
+            if result is None:
+                result = orjson.loads(response.content)
+            if not isinstance(result, dict):
+                print("❌ 查询失败: 响应不是 JSON 对象")
+                print(f"响应内容: {self._preview(response)}")
                 return None
-                
-        except Exception as e:
-            print(f"❌ 查询请求异常: {str(e)}")
+            if result.get('errors'):
+                print(f"⚠️ 查询返回错误:")
+                for error in result['errors']:
+                    print(f"  - {error.get('message')}")
+            return result
+        
+        if response.status_code == 401:
+            print(f"❌ 认证失败: 令牌无效或已过期")
+        else:
+            print(f"❌ 查询失败: HTTP {response.status_code}")
+        
+        error_data = self._error_body(response)
+        if error_data is not None:
+            if error_data.get('errors'):
+                for error in error_data['errors']:
+                    print(f"  - {error.get('message')}")
+        else:
+            print(f"响应内容: {self._preview(response)}")
+        return None
+    
+    @staticmethod
+    def _preview(response, limit=200):
+        """按 UTF-8 解码响应体开头部分，跳过 response.text 对整个响应体的编码探测与解码"""
+        return response.content[:limit].decode('utf-8', errors='replace')
+    
+    @classmethod
+    def _error_body(cls, response):
+        """解析错误响应的 JSON 对象，非 JSON、格式错误或不是对象时返回 None 以便改为打印原始内容"""
+        if not cls._is_json(response):
+            return None
+        try:
+            error_data = orjson.loads(response.content)
+        except ValueError:
             return None
+        return error_data if isinstance(error_data, dict) else None
+    
+    @staticmethod
+    def _is_json(response):
+        """根据 Content-Type 判断响应体是否为 JSON"""
+        return response.headers.get('content-type', '').startswith(JSON_CONTENT_TYPES)
     
-    def print_result(self, result, format_output=True):
+    @staticmethod
+    def print_result(result, format_output=True):
         """格式化打印查询结果
 
         Args:
@@ -166,31 +1011,69 @@ class GraphQLClient:
         
         if format_output:
             print("\n📊 查询结果:")
-            print(json.dumps(result, indent=2, ensure_ascii=False))
+            print(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode())
         else:
             print(result)
         
         # 如果有数据，提取一些关键信息
-        if result.get('data'):
-            # 检查是否为用户信息查询
-            if result['data'].get('me'):
-                user = result['data']['me']
-                print(f"\n👤 当前用户: {user.get('email')}")
-                print(f"用户ID: {user.get('userId')}")
-                print(f"角色: {user.get('role')}")
-                
-            # 检查是否有产品数据
-            if result['data'].get('products'):
-                products = result['data']['products']
-                print(f"\n📦 共找到 {products.get('totalCount', 0)} 个产品")
-                
-                if products.get('items'):
-                    print("\n产品列表:")
-                    for i, product in enumerate(products['items'], 1):
-                        title = product.get('title', '未命名产品')
-                        vendor = product.get('vendor', '未知供应商')
-                        price = f"{product.get('minPrice', 0)} - {product.get('maxPrice', 0)}"
-                        print(f"{i}. {title} ({vendor}) - 价格: {price}")
+        data = result.get('data')
+        if not data:
+            return
+        
+        # 检查是否为用户信息查询
+        user = data.get('me')
+        if user:
+            print(f"\n👤 当前用户: {user.get('email')}")
+            print(f"用户ID: {user.get('userId')}")
+            print(f"角色: {user.get('role')}")
+        
+        # 检查是否有产品数据
+        products = data.get('products')
+        if products:
+            print(f"\n📦 共找到 {products.get('totalCount', 0)} 个产品")
+            
+            items = products.get('items')
+            if items:
+                # 拼接后一次性写出，避免逐行 print 带来的大量写调用
+                lines = [
+                    f"{i}. {product.get('title', '未命名产品')} ({product.get('vendor', '未知供应商')})"
+                    f" - 价格: {product.get('minPrice', 0)} - {product.get('maxPrice', 0)}"
+                    for i, product in enumerate(items, 1)
+                ]
+                sys.stdout.write("\n产品列表:\n" + "\n".join(lines) + "\n")
+
+
+def run_queries(url, email, password, queries, auth_endpoint="/auth/token", graphql_endpoint="/graphql",
+                max_workers=10, verbose=False, http2=False):
+    """登录一次后并发执行多个查询，供脚本批量调用
+
+    同一进程内的重复调用复用 GraphQLClient.default() 缓存的客户端及其令牌，无需重复登录；
+    并发查询的 httpx 连接池在每次调用时新建。查询总是发往本次传入的 graphql_endpoint。
+
+    Args:
+        url (str): API 基础 URL
+        email (str): 用户邮箱
+        password (str): 密码
+        queries (list): (query, variables) 元组列表
+        auth_endpoint (str): 认证接口路径
+        graphql_endpoint (str): GraphQL 接口路径
+        max_workers (int): 最大并发请求数
+        verbose (bool): 是否显示详细日志
+        http2 (bool): 是否使用 HTTP/2 连接
+
+    Returns:
+        list: 与 queries 顺序一致的查询结果，登录失败时返回 None
+    """
+    # graphql_endpoint 在每次查询时显式传入，不依赖共享客户端创建时的默认值
+    client = GraphQLClient.default(url, email, password, verbose=verbose, http2=http2,
+                                   auth_endpoint=auth_endpoint)
+    if client is None:
+        return None
+    
+    # 未安装 httpx 时退化为在同一个会话上顺序执行
+    if httpx is None:
+        return [client.execute_query(query, variables, graphql_endpoint) for query, variables in queries]
+    return client.execute_many(queries, endpoint=graphql_endpoint, max_workers=max_workers)
 
 
 def main():
@@ -203,50 +1086,65 @@ def main():
     parser.add_argument("--query", help="GraphQL 查询字符串")
     parser.add_argument("--query-file", help="包含 GraphQL 查询的文件")
     parser.add_argument("--variables", help="GraphQL 查询变量 (JSON 格式)")
+    parser.add_argument("--queries-file", help="批量查询文件 (JSONL，每行一个 {query, variables})")
+    parser.add_argument("--http2", action="store_true", help="使用 HTTP/2 连接 (需要 httpx[http2])")
     parser.add_argument("--verbose", action="store_true", help="显示详细日志")
     
     args = parser.parse_args()
     
+    if args.queries_file:
+        try:
+            with open(args.queries_file, 'r', encoding='utf-8') as f:
+                queries = []
+                for line in f:
+                    if line.strip():
+                        item = orjson.loads(line)
+                        queries.append((item['query'], item.get('variables')))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ 无法读取批量查询文件: {str(e)}")
+            sys.exit(1)
+        
+        results = run_queries(args.url, args.email, args.password, queries, args.auth_endpoint,
+                              args.graphql_endpoint, verbose=args.verbose, http2=args.http2)
+        if results is None:
+            sys.exit(1)
+        
+        for result in results:
+            GraphQLClient.print_result(result)
+        return
+    
     # 获取查询字符串
     query = args.query
     if args.query_file:
         try:
             with open(args.query_file, 'r', encoding='utf-8') as f:
                 query = f.read()
-        except Exception as e:
+        except OSError as e:
             print(f"❌ 无法读取查询文件: {str(e)}")
             sys.exit(1)
     
-    if not query:
-        # 使用默认查询 - 修改为匹配实际schema的查询
-        query = """
-        {
-          me {
-            userId
-            email
-            role
-          }
-        }
-        """
-    
     # 解析变量
     variables = None
     if args.variables:
         try:
-            variables = json.loads(args.variables)
-        except Exception as e:
+            variables = orjson.loads(args.variables)
+        except ValueError as e:
             print(f"❌ 无法解析查询变量: {str(e)}")
             sys.exit(1)
     
     # 创建客户端并执行查询
-    client = GraphQLClient(args.url, verbose=args.verbose)
+    client = GraphQLClient(args.url, verbose=args.verbose, http2=args.http2,
+                           auth_endpoint=args.auth_endpoint, graphql_endpoint=args.graphql_endpoint)
     
     # 登录获取令牌
-    if not client.login(args.email, args.password, args.auth_endpoint):
+    if not client.login(args.email, args.password):
         sys.exit(1)
     
-    # 执行查询
-    result = client.execute_query(query, variables, args.graphql_endpoint)
+    # 执行查询，未指定查询时直接发送预先编码的默认请求体
+    if query:
+        result = client.execute_query(query, variables)
+    else:
+        result = client.execute_raw(DEFAULT_BODY)
     
     # 打印结果
     if result:
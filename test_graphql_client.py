@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+GraphQL 客户端测试脚本
+
+用法：
+1. python -m pytest test_graphql_client.py
+2. 直接运行: python test_graphql_client.py
+"""
+
+import orjson
+import pytest
+
+from graphql_client import GraphQLClient
+
+# 两个查询使用同名的变量 $id 和同名的片段 F
+PRODUCT_QUERY = """
+query Product($id: ID!) {
+  product(id: $id) { ...F }
+}
+fragment F on Product { id title }
+"""
+
+ORDER_QUERY = """
+query Order($id: ID!) {
+  order: orderById(id: $id) { ...F }
+  me { email }
+}
+fragment F on Order { id totalPrice }
+"""
+
+
+def test_merge_queries_prefixes_clashing_names():
+    # 合并查询依赖可选的 graphql-core，未安装时跳过
+    parse = pytest.importorskip("graphql").parse
+    
+    query, variables, aliases = GraphQLClient._merge_queries([
+        (PRODUCT_QUERY, {"id": "p1"}),
+        (ORDER_QUERY, {"id": "o1"}),
+    ])
+    
+    # 合并结果必须仍是合法的 GraphQL 文档
+    document = parse(query)
+    
+    operation = document.definitions[0]
+    assert [d.variable.name.value for d in operation.variable_definitions] == ["batch0_id", "batch1_id"]
+    assert variables == {"batch0_id": "p1", "batch1_id": "o1"}
+    
+    fields = {field.alias.value: field for field in operation.selection_set.selections}
+    assert set(fields) == {"batch0_product", "batch1_order", "batch1_me"}
+    assert fields["batch0_product"].arguments[0].value.name.value == "batch0_id"
+    assert fields["batch1_order"].name.value == "orderById"
+    assert fields["batch0_product"].selection_set.selections[0].name.value == "batch0_F"
+    assert fields["batch1_order"].selection_set.selections[0].name.value == "batch1_F"
+    
+    fragments = {d.name.value: d.type_condition.name.value for d in document.definitions[1:]}
+    assert fragments == {"batch0_F": "Product", "batch1_F": "Order"}
+    
+    assert aliases == [
+        {"batch0_product": "product"},
+        {"batch1_order": "order", "batch1_me": "me"},
+    ]
+
+
+def test_split_merged_restores_results_and_errors():
+    aliases = [
+        {"batch0_product": "product"},
+        {"batch1_order": "order", "batch1_me": "me"},
+    ]
+    path_error = {"message": "订单不存在", "path": ["batch1_order"]}
+    global_error = {"message": "服务器繁忙"}
+    merged = {
+        "data": {"batch0_product": {"id": "p1"}, "batch1_order": None, "batch1_me": {"email": "a@b.c"}},
+        "errors": [path_error, global_error],
+    }
+    
+    results = GraphQLClient._split_merged(merged, aliases)
+    
+    assert results == [
+        {"data": {"product": {"id": "p1"}}, "errors": [global_error]},
+        {"data": {"order": None, "me": {"email": "a@b.c"}}, "errors": [path_error, global_error]},
+    ]
+
+
+def test_apq_error_code_reads_error_extensions_only():
+    not_supported = {"errors": [{"message": "PersistedQueryNotSupported",
+                                 "extensions": {"code": "PERSISTED_QUERY_NOT_SUPPORTED"}}]}
+    assert GraphQLClient._apq_error_code(not_supported) == "PERSISTED_QUERY_NOT_SUPPORTED"
+    
+    # 用户数据中出现错误码字符串不应触发 APQ 回退
+    user_data = {"data": {"note": "PERSISTED_QUERY_NOT_FOUND"}}
+    assert GraphQLClient._apq_error_code(user_data) is None
+    assert GraphQLClient._apq_error_code({"errors": [{"message": "其他错误"}]}) is None
+    assert GraphQLClient._apq_error_code(None) is None
+
+
+
+class FakeResponse:
+    """只包含 GraphQLClient 用到的属性的响应对象"""
+    
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.content = orjson.dumps(body)
+        self.headers = {'content-type': 'application/json'}
+
+
+def make_apq_client(server):
+    """创建一个启用 APQ、请求体交给 server(body) 处理的已登录客户端，返回客户端与收到的请求体列表"""
+    client = GraphQLClient("http://localhost:3000", persisted_queries=True)
+    client.token = "token"
+    bodies = []
+    
+    def post(url, body):
+        bodies.append(orjson.loads(body))
+        return server(bodies[-1])
+    
+    client._post = post
+    return client, bodies
+
+
+def test_post_persisted_disables_apq_when_server_ignores_extensions():
+    # 与 app/graphql/server.js 一样只读取 query 字段的服务端
+    def server(body):
+        if not body.get('query'):
+            return FakeResponse(400, {"errors": [{"message": "GraphQL operations must contain a non-empty `query`"}]})
+        return FakeResponse(200, {"data": {"me": {"email": "a@b.c"}}})
+    
+    client, bodies = make_apq_client(server)
+    
+    for _ in range(2):
+        assert client.execute_query("{ me { email } }") == {"data": {"me": {"email": "a@b.c"}}}
+    
+    assert client.persisted_queries is False
+    assert [('query' in body, 'extensions' in body) for body in bodies] == [
+        (False, True),  # 先只发送摘要
+        (True, False),  # 无 APQ 错误码的失败，关闭 APQ 后重发完整查询
+        (True, False),  # 之后都是普通请求
+    ]
+
+
+def test_post_persisted_registers_hash_after_not_found():
+    registered = set()
+    
+    def server(body):
+        query_hash = body['extensions']['persistedQuery']['sha256Hash']
+        if 'query' in body:
+            registered.add(query_hash)
+        elif query_hash not in registered:
+            return FakeResponse(200, {"errors": [{"message": "PersistedQueryNotFound",
+                                                  "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}]})
+        return FakeResponse(200, {"data": {"me": {"email": "a@b.c"}}})
+    
+    client, bodies = make_apq_client(server)
+    
+    for _ in range(2):
+        assert client.execute_query("{ me { email } }") == {"data": {"me": {"email": "a@b.c"}}}
+    
+    assert client.persisted_queries is True
+    assert ['query' in body for body in bodies] == [False, True, False]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            try:
+                test()
+            except pytest.skip.Exception as e:
+                print(f"⏭️ {name}: {e}")
+                continue
+            print(f"✅ {name}")